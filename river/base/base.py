@@ -231,6 +231,8 @@ class Base:
     @property
     def _raw_memory_usage(self) -> int:
         """Return the memory usage in bytes."""
+        from river.utils import skmultiflow_utils
+
         buffer = collections.deque([self])
         seen = set()
         size = 0
@@ -245,9 +247,11 @@ class Base:
             if isinstance(obj, dict):
                 buffer.extend([k for k in obj.keys()])
                 buffer.extend([v for v in obj.values()])
-            elif hasattr(obj, "__dict__"):  # Save object contents
-                contents: dict = vars(obj)
-                size += sys.getsizeof(contents)
+            elif hasattr(obj, "__dict__") or skmultiflow_utils.slot_names(type(obj)):
+                # Save object contents, whether they are stored in a __dict__ or in slots
+                if hasattr(obj, "__dict__"):
+                    size += sys.getsizeof(vars(obj))
+                contents: dict = skmultiflow_utils.object_attributes(obj)
                 buffer.extend([k for k in contents.keys()])
                 buffer.extend([v for v in contents.values()])
             elif hasattr(obj, "__iter__") and not isinstance(
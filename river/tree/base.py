@@ -17,10 +17,13 @@ from xml.etree import ElementTree as ET
 import pandas as pd
 
 from river.base import Base
+from river.utils.skmultiflow_utils import object_attributes
 
 class Branch(Base, abc.ABC):
     """A generic tree branch."""
 
+    __slots__ = ["children"]
+
     def __init__(self, *children):
         self.children = children
 
@@ -143,7 +146,7 @@ class Branch(Base, abc.ABC):
                     "parent": node_ids[id(parent)] if parent else pd.NA,
                     "is_leaf": isinstance(node, Leaf),
                     "depth": depth,
-                    **{k: v for k, v in node.__dict__.items() if k != "children"},
+                    **{k: v for k, v in object_attributes(node).items() if k != "children"},
                 }
             )
             try:
@@ -253,13 +253,9 @@ class HoeffdingAdaptiveTreeRegressor(HoeffdingTreeRegressor):
 
         leaf_model = None
         if self.leaf_prediction in {self._MODEL, self._ADAPTIVE}:
-            if parent is None:
-                leaf_model = deepcopy(self.leaf_model)
-            else:
-                try:
-                    leaf_model = deepcopy(parent._leaf_model)  # noqa
-                except AttributeError:
-                    leaf_model = deepcopy(self.leaf_model)
+            # Branches reached due to emerging categories have no model to inherit from
+            parent_model = getattr(parent, "_leaf_model", None)
+            leaf_model = deepcopy(self.leaf_model if parent_model is None else parent_model)
 
         if self.leaf_prediction == self._TARGET_MEAN:
             return AdaLeafRegMean(
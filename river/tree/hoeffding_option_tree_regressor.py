@@ -1,14 +1,483 @@
-from copy import deepcopy
+import copy
+import ctypes
+import functools
+import pickle
+import typing
 
-from river import base
+import numpy as np
+import pandas as pd
+
+from river import base, linear_model, optim
 from .hoeffding_tree_regressor import HoeffdingTreeRegressor
-from .nodes.branch import DTBranch, OptionNode
+from .nodes.branch import (
+    DTBranch,
+    NumericBinaryBranch,
+    OptionNode,
+    sum_leaves,
+)
 from .nodes.htr_nodes import LeafModel
 from .nodes.leaf import HTLeaf
-from .splitter import Splitter
+from .splitter import HistogramSplitterReg, Splitter
+from .utils import iter_records
+
+# Node kinds used in the flattened representation of the tree
+_LEAF = 0
+_SPLIT = 1
+_OPTION = 2
+
+
+class CompiledTree(typing.NamedTuple):
+    """Structure of arrays (SoA) representation of an option tree.
+
+    Node `0` is the root. Branches hold the index of the feature they test in `feat`, their
+    threshold in `thr`, and the indices of their children in `left` and `right`. The most
+    traversed path, which is taken when the split feature is missing, depends on the weights of
+    the leaves, hence it is looked up on the node objects when needed, see `_missing_child`. The
+    intercepts and the weights of the leaf linear models are stored apart, one row per leaf, in
+    `leaf_bias` and `leaf_w`. The row of a leaf is given by its `left` entry. Both are empty if
+    the tree only describes the structure. The children of option nodes
+    are stored in compressed sparse row format: the children of node `i` are
+    `opt_idx[opt_ptr[i]:opt_ptr[i + 1]]`. If the nodes have been reordered, `perm[i]` is the
+    depth-first index of the node stored at position `i`. `nodes` holds the node objects in
+    depth-first order, hence the node stored at position `i` is `nodes[perm[i]]`.
+
+    """
+
+    features: list
+    kind: np.ndarray
+    feat: np.ndarray
+    thr: np.ndarray
+    left: np.ndarray
+    right: np.ndarray
+    leaf_bias: np.ndarray
+    leaf_w: np.ndarray
+    opt_ptr: np.ndarray
+    opt_idx: np.ndarray
+    perm: typing.Optional[np.ndarray] = None
+    nodes: typing.Optional[list] = None
+
+
+def _segment_offsets(sizes: np.ndarray) -> np.ndarray:
+    """Position of each element within its segment when segments of `sizes` are concatenated."""
+    return np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+
+
+def _children(tree: CompiledTree, i: int) -> typing.List[int]:
+    if tree.kind[i] == _SPLIT:
+        return [tree.left[i], tree.right[i]]
+    if tree.kind[i] == _OPTION:
+        return list(tree.opt_idx[tree.opt_ptr[i] : tree.opt_ptr[i + 1]])
+    return []
+
+
+def _relayout_veb(tree: CompiledTree) -> CompiledTree:
+    """Reorder the nodes of a compiled tree following the van Emde Boas layout.
+
+    The tree is cut at half its height. The top subtree is laid out first, followed by each of
+    the bottom subtrees, all of them being laid out recursively in the same fashion. A path from
+    the root to a leaf thus crosses few contiguous blocks of memory, whatever the size of the
+    cache lines. The children of an option node are treated as regular children, hence each of
+    them roots its own subtree.
+
+    """
+    n_nodes = len(tree.kind)
+    children = [_children(tree, i) for i in range(n_nodes)]
+
+    height = np.ones(n_nodes, dtype=np.int64)
+    for i in reversed(range(n_nodes)):  # children always come after their parent
+        if children[i]:
+            height[i] = 1 + max(height[c] for c in children[i])
+
+    order = []
+
+    def layout(root, h):
+        # Lay out the nodes which are less than h levels below root
+        if h == 1:
+            order.append(root)
+            return
+        g = h // 2
+        layout(root, g)
+        frontier = [root]
+        for _ in range(g):
+            frontier = [c for node in frontier for c in children[node]]
+        for node in frontier:
+            layout(node, h - g)
+
+    layout(0, int(height[0]))
+
+    perm = np.array(order, dtype=np.int64)
+    inv = np.empty(n_nodes, dtype=np.int64)
+    inv[perm] = np.arange(n_nodes)
+
+    kind = tree.kind[perm]
+    is_split = kind == _SPLIT
+    starts = tree.opt_ptr[perm]
+    sizes = tree.opt_ptr[perm + 1] - starts
+
+    # The rows of the leaf models follow the new order of the leaves
+    is_leaf = kind == _LEAF
+    leaf_rows = tree.left[perm][is_leaf]
+    left = np.where(is_split, inv[tree.left[perm]], 0)
+    left[is_leaf] = np.arange(len(leaf_rows))
+
+    return CompiledTree(
+        features=tree.features,
+        kind=kind,
+        feat=tree.feat[perm],
+        thr=tree.thr[perm],
+        left=left,
+        right=np.where(is_split, inv[tree.right[perm]], 0),
+        leaf_bias=tree.leaf_bias[leaf_rows],
+        leaf_w=tree.leaf_w[leaf_rows],
+        opt_ptr=np.concatenate(([0], np.cumsum(sizes))),
+        opt_idx=inv[tree.opt_idx[np.repeat(starts, sizes) + _segment_offsets(sizes)]],
+        perm=perm if tree.perm is None else tree.perm[perm],
+        nodes=tree.nodes,
+    )
+
+
+def _missing_child(tree: CompiledTree, nd: np.ndarray) -> np.ndarray:
+    """Return the child along the most traversed path of each of the split nodes `nd`."""
+    positions, inverse = np.unique(nd, return_inverse=True)
+    dfs = positions if tree.perm is None else tree.perm[positions]
+    to_right = np.array([tree.nodes[i].most_common_path()[0] == 1 for i in dfs])[inverse]
+    return np.where(to_right, tree.right[nd], tree.left[nd])
+
+
+def _to_bf16(a: np.ndarray) -> np.ndarray:
+    """Round to the nearest bfloat16, returned as the upper 16 bits of the float32 values."""
+    bits = a.astype(np.float32).view(np.uint32)
+    bits = bits + (0x7FFF + ((bits >> 16) & 1))  # round half to even
+    return (bits >> 16).astype(np.uint16)
+
+
+def _from_bf16(a: np.ndarray) -> np.ndarray:
+    return (a.astype(np.uint32) << 16).view(np.float32)
+
+
+def _quantize(tree: CompiledTree, precision: str) -> CompiledTree:
+    """Narrow the arrays of a compiled tree to the given precision ('fp32' or 'bf16')."""
+    leaf_w = tree.leaf_w.astype(np.float32)
+    if precision == "bf16":
+        leaf_w = _to_bf16(leaf_w)
+    feat_dtype = np.int16 if len(tree.features) <= np.iinfo(np.int16).max else np.int32
+    return tree._replace(
+        feat=tree.feat.astype(feat_dtype),
+        thr=tree.thr.astype(np.float32),
+        leaf_bias=tree.leaf_bias.astype(np.float32),
+        leaf_w=leaf_w,
+    )
+
+
+def _predict_compiled(
+    tree: CompiledTree, X: np.ndarray, mean_func: typing.Callable
+) -> np.ndarray:
+    """Average the predictions of all the leaves reached by each row of `X`.
+
+    `mean_func` maps the raw outputs of the leaf linear models to predictions.
+
+    All the rows are routed down the tree at once. Each iteration moves every active
+    (row, node) pair one level down. The pairs that reach an option node are replicated, one
+    per option child, and the pairs that reach a leaf are retired.
+
+    """
+    n = len(X)
+    X_dot = np.nan_to_num(X)  # missing features do not contribute to the leaf models
+    is_bf16 = tree.leaf_w.dtype == np.uint16
+    total = np.zeros(n)
+    count = np.zeros(n)
+
+    rows = np.arange(n)
+    nodes = np.zeros(n, dtype=np.int64)
+    while len(rows):
+        kind = tree.kind[nodes]
+
+        at_leaf = kind == _LEAF
+        if at_leaf.any():
+            # The leaves hold the row of their model in left
+            r, lf = rows[at_leaf], tree.left[nodes[at_leaf]]
+            # Only the gathered rows of bfloat16 weights are widened
+            leaf_w = _from_bf16(tree.leaf_w[lf]) if is_bf16 else tree.leaf_w[lf]
+            pred = mean_func(
+                tree.leaf_bias[lf] + np.einsum("ij,ij->i", X_dot[r], leaf_w)
+            )
+            np.add.at(total, r, pred)
+            np.add.at(count, r, 1)
+
+        at_split = kind == _SPLIT
+        r, nd = rows[at_split], nodes[at_split]
+        vals = X[r, tree.feat[nd]]
+        children = np.where(vals <= tree.thr[nd], tree.left[nd], tree.right[nd])
+        missing = np.isnan(vals)
+        if missing.any():
+            children[missing] = _missing_child(tree, nd[missing])
+
+        at_option = kind == _OPTION
+        o_rows, o_nodes = rows[at_option], nodes[at_option]
+        starts = tree.opt_ptr[o_nodes]
+        sizes = tree.opt_ptr[o_nodes + 1] - starts
+
+        rows = np.concatenate((r, np.repeat(o_rows, sizes)))
+        nodes = np.concatenate(
+            (children, tree.opt_idx[np.repeat(starts, sizes) + _segment_offsets(sizes)])
+        )
+
+    return np.divide(total, count, out=np.zeros(n), where=count > 0)
+
+
+def _route_compiled(tree: CompiledTree, X: np.ndarray) -> np.ndarray:
+    """Return the position of the leaf each row of `X` is sorted into for learning.
+
+    As in `learn_one`, only the first child of the option nodes is followed.
+
+    """
+    leaves = np.empty(len(X), dtype=np.int64)
+    rows = np.arange(len(X))
+    nodes = np.zeros(len(X), dtype=np.int64)
+    while len(rows):
+        kind = tree.kind[nodes]
+
+        at_leaf = kind == _LEAF
+        leaves[rows[at_leaf]] = nodes[at_leaf]
+        rows, nodes, kind = rows[~at_leaf], nodes[~at_leaf], kind[~at_leaf]
+
+        at_option = kind == _OPTION
+        nodes[at_option] = tree.opt_idx[tree.opt_ptr[nodes[at_option]]]
+
+        at_split = kind == _SPLIT
+        r, nd = rows[at_split], nodes[at_split]
+        vals = X[r, tree.feat[nd]]
+        children = np.where(vals <= tree.thr[nd], tree.left[nd], tree.right[nd])
+        missing = np.isnan(vals)
+        if missing.any():
+            children[missing] = _missing_child(tree, nd[missing])
+        nodes[at_split] = children
+
+    return leaves
 
 
-class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor):
+def _emit_c(tree: CompiledTree) -> str:
+    """Generate the C source code of a compiled tree.
+
+    Each node which is the root of the tree or a child of an option node becomes a function that
+    adds the predictions of the leaves it reaches to `*s` and their number to `*c`. Within such a
+    function the splits are jumps between labels, and option nodes call the functions of their
+    children one after the other. Numbers are written as hexadecimal literals, which are exact.
+    The rows given to `predict_many` are independent, hence they are shared among threads when
+    the code is built with OpenMP. The children of the option nodes are visited sequentially
+    within each row.
+
+    """
+    kind = tree.kind
+    leaf_w = _from_bf16(tree.leaf_w) if tree.leaf_w.dtype == np.uint16 else tree.leaf_w
+    roots = [0] + sorted(set(tree.opt_idx.tolist()) - {0})
+
+    def lit(v):
+        return float(v).hex()
+
+    lines = [
+        "#include <math.h>",
+        "",
+        f"#define N_FEATURES {len(tree.features)}",
+        "#define V(v) (isnan(v) ? 0.0 : (v))",
+        "",
+    ]
+    lines += [f"static void node_{r}(const double *x, double *s, double *c);" for r in roots]
+
+    for r in roots:
+        lines += ["", f"static void node_{r}(const double *x, double *s, double *c) {{"]
+        stack = [r]
+        while stack:
+            i = stack.pop()
+            lines.append(f"L{i}:")
+            if kind[i] == _SPLIT:
+                f = tree.feat[i]
+                # The most traversed path is resolved once and for all in the exported code
+                miss = _missing_child(tree, np.array([i]))[0]
+                lines += [
+                    f"    if (isnan(x[{f}])) goto L{miss};",
+                    f"    if (x[{f}] <= {lit(tree.thr[i])}) goto L{tree.left[i]};",
+                    f"    goto L{tree.right[i]};",
+                ]
+                stack += [tree.right[i], tree.left[i]]
+            elif kind[i] == _OPTION:
+                for child in tree.opt_idx[tree.opt_ptr[i] : tree.opt_ptr[i + 1]]:
+                    lines.append(f"    node_{child}(x, s, c);")
+                lines.append("    return;")
+            else:
+                row = tree.left[i]
+                terms = [lit(tree.leaf_bias[row])] + [
+                    f"{lit(w)} * V(x[{j}])" for j, w in enumerate(leaf_w[row]) if w != 0.0
+                ]
+                lines += [f"    *s += {' + '.join(terms)};", "    *c += 1.0;", "    return;"]
+        lines.append("}")
+
+    lines += [
+        "",
+        "double predict_one(const double *x) {",
+        "    double s = 0.0, c = 0.0;",
+        "    node_0(x, &s, &c);",
+        "    return c > 0.0 ? s / c : 0.0;",
+        "}",
+        "",
+        "void predict_many(const double *X, long n, double *y) {",
+        "    #pragma omp parallel for schedule(static)",
+        "    for (long i = 0; i < n; i++)",
+        "        y[i] = predict_one(X + i * N_FEATURES);",
+        "}",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+class OptionArrays(typing.NamedTuple):
+    """Structure of arrays representation of the children of an option node.
+
+    The children which are numeric binary branches are described by the index of their feature
+    in `feat` and their threshold in `thr`, only for the positions listed in `tested`. Each
+    child owns two consecutive entries of `slot`, one per side, which point into `targets`: the
+    grandchildren in the case of numeric binary branches, the child itself otherwise. The
+    targets which are linear model leaves have their intercept and weights stored in `bias` and
+    in the rows of `W`, the columns of which are given by `columns`. The other targets are
+    visited recursively.
+
+    """
+
+    columns: dict
+    tested: np.ndarray
+    feat: np.ndarray
+    thr: np.ndarray
+    slot: np.ndarray
+    targets: list
+    is_linear: np.ndarray
+    bias: np.ndarray
+    W: np.ndarray
+
+
+def _option_arrays(node: OptionNode) -> OptionArrays:
+    """Gather the children and grandchildren of an option node into arrays."""
+    columns = {}
+    targets = []
+    k = len(node.children)
+    feat = np.full(k, -1, dtype=np.int64)
+    thr = np.zeros(k)
+    slot = np.zeros((k, 2), dtype=np.int64)
+
+    for j, child in enumerate(node.children):
+        if isinstance(child, NumericBinaryBranch):
+            feat[j] = columns.setdefault(child.feature, len(columns))
+            thr[j] = child.threshold
+            slot[j] = len(targets), len(targets) + 1
+            targets.extend(child.children)
+        else:
+            slot[j] = len(targets)
+            targets.append(child)
+
+    is_linear = np.array(
+        [
+            isinstance(target, LeafModel)
+            and isinstance(target._leaf_model, linear_model.LinearRegression)  # noqa
+            for target in targets
+        ]
+    )
+    for t in np.flatnonzero(is_linear):
+        for feature in targets[t]._leaf_model.weights:  # noqa
+            columns.setdefault(feature, len(columns))
+
+    tested = np.flatnonzero(feat >= 0)
+    arrays = OptionArrays(
+        columns=columns,
+        tested=tested,
+        feat=feat[tested],
+        thr=thr[tested],
+        slot=slot.ravel(),
+        targets=targets,
+        is_linear=is_linear,
+        bias=np.zeros(len(targets)),
+        W=np.zeros((len(targets), len(columns))),
+    )
+    for t in np.flatnonzero(is_linear):
+        _fill_option_row(arrays, t)
+    return arrays
+
+
+def _fill_option_row(arrays: OptionArrays, t: int) -> bool:
+    """Copy the linear model of the target `t` into its row.
+
+    Returns `False` if the model uses features which have no column, in which case the arrays
+    have to be rebuilt.
+
+    """
+    model = arrays.targets[t]._leaf_model  # noqa
+    row = arrays.W[t]
+    row[:] = 0.0
+    for feature, w in model.weights.items():
+        try:
+            row[arrays.columns[feature]] = w
+        except KeyError:
+            return False
+    arrays.bias[t] = model.intercept
+    return True
+
+
+def _prototype(model) -> typing.Callable:
+    """Return a function which creates copies of `model`.
+
+    The model is serialized once and the copies are unpickled, which is faster than deep-copying
+    it every time. Models which cannot be pickled, for instance because they hold a lambda
+    function, are deep-copied instead.
+
+    """
+    try:
+        blob = pickle.dumps(model, pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return functools.partial(copy.deepcopy, model)
+    return functools.partial(pickle.loads, blob)
+
+
+def _decide(best, second_best, hoeffding_bound, tie_threshold, merits=None):
+    """Decide between a regular split and an option split.
+
+    Parameters
+    ----------
+    best
+        Merit of the best split candidate.
+    second_best
+        Merit of the second best split candidate.
+    hoeffding_bound
+        The current Hoeffding bound.
+    tie_threshold
+        Threshold below which a split is forced to break ties.
+    merits
+        Merits of all the split candidates, in any order. Only needed to look for poor
+        attributes.
+
+    Returns
+    -------
+    Whether to split, whether to perform an option split instead, and a mask of the poor
+    candidates, aligned with `merits` (`None` if `merits` is `None`).
+
+    """
+    # The ratios to the best merit are computed as products with its reciprocal
+    with np.errstate(divide="ignore"):
+        inv_best = 1.0 / np.float64(best)
+    threshold = 1.0 - hoeffding_bound
+    should_split = bool(
+        best > 0.0
+        and (second_best * inv_best < threshold or hoeffding_bound < tie_threshold)
+    )
+
+    poor_mask = None
+    if merits is not None:
+        with np.errstate(invalid="ignore"):
+            ratios = merits * inv_best
+            poor_mask = ratios < second_best * inv_best - 2 * hoeffding_bound
+
+    # Multiple competitive split candidates and no clear winner
+    return should_split, not should_split, poor_mask
+
+
+class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor, base.MiniBatchRegressor):
     """Hoeffding Tree regressor with Options.
 
     Parameters
@@ -45,7 +514,8 @@ class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor):
         Different splitters are available for classification and regression tasks. Classification
         and regression splitters can be distinguished by their property `is_target_class`.
         This is an advanced option. Special care must be taken when choosing different splitters.
-        By default, `tree.splitter.EBSTSplitter` is used if `splitter` is `None`.
+        By default, `tree.splitter.EBSTSplitter` is used if `splitter` is `None`, unless
+        `hist_bins` is set.
     min_samples_split
         The minimum number of samples every branch resulting from a split candidate must have
         to be considered valid.
@@ -61,6 +531,15 @@ class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor):
         If True, disable poor attributes to reduce memory usage.
     merit_preprune
         If True, enable merit-based tree pre-pruning.
+    predict_precision
+        Precision of the arrays used by `predict_many`. Training is not affected.</br>
+        - 'fp64' - Double precision, same predictions as `predict_one`</br>
+        - 'fp32' - Single precision thresholds, leaf models and inputs</br>
+        - 'bf16' - Like 'fp32', but the leaf model weights are stored as bfloat16</br>
+    hist_bins
+        If set and `splitter` is `None`, `tree.splitter.HistogramSplitterReg` is used with the given
+        number of bins. The cost of a split attempt then depends on the number of bins rather
+        than on the number of distinct values observed by the leaves.
 
     Notes
     -----
@@ -97,6 +576,21 @@ class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor):
     MAE: 0.782258
     """
 
+    _FP64 = "fp64"
+    _FP32 = "fp32"
+    _BF16 = "bf16"
+    _VALID_PREDICT_PRECISION = [_FP64, _FP32, _BF16]
+
+    # Attributes which hold copies of the tree used to speed up learning and prediction
+    _CACHES = (
+        "_compiled",
+        "_compiled_seen",
+        "_compiled_quantized",
+        "_routing",
+        "_option_arrays",
+        "_option_rows",
+    )
+
     def __init__(
             self,
             grace_period: int = 200,
@@ -114,7 +608,9 @@ class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor):
             memory_estimate_period: int = 1000000,
             stop_mem_management: bool = False,
             remove_poor_attrs: bool = False,
-            merit_preprune: bool = True
+            merit_preprune: bool = True,
+            predict_precision: str = "fp64",
+            hist_bins: int = None,
     ):
         if not leaf_prediction == super()._MODEL:
             print(
@@ -124,6 +620,17 @@ class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor):
             )
             leaf_prediction = self._MODEL
 
+        if predict_precision not in self._VALID_PREDICT_PRECISION:
+            raise ValueError(
+                f"Invalid predict_precision option {predict_precision}, valid options are "
+                f"{self._VALID_PREDICT_PRECISION}."
+            )
+        self.predict_precision = predict_precision
+
+        self.hist_bins = hist_bins
+        if splitter is None and hist_bins is not None:
+            splitter = HistogramSplitterReg(n_bins=hist_bins)
+
         super().__init__(
             grace_period=grace_period,
             max_depth=max_depth,
@@ -145,6 +652,35 @@ class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor):
 
         self._n_option_nodes = 0
         self._n_option_branches = 0
+        # Set whenever the root is replaced, the root never goes back to being a leaf
+        self._root_is_branch = False
+
+        # New leaves get their models from prototypes, see _prototype. The prototype of the
+        # leaf being split only lives as long as the split.
+        self._leaf_model_proto = None
+        self._parent_proto = None
+
+        # Flattened version of the tree used by predict_many. It is rebuilt lazily once the
+        # structure of the tree changes, which sets _dirty. Otherwise, only the rows of the leaves
+        # which have learned are refreshed, see _refresh_compiled. The total weight of each leaf
+        # when its row was filled is kept in _compiled_seen, and the copy of the tree with the
+        # precision given by predict_precision in _compiled_quantized.
+        self._compiled = None
+        self._compiled_seen = None
+        self._compiled_stamp = None
+        self._compiled_quantized = None
+        self._dirty = True
+        # Structure of the tree used by learn_many to route the rows, without the leaf models. It
+        # is reset whenever a leaf is split.
+        self._routing = None
+        # Arrays used by predict_one to evaluate the option nodes, see _option_sum. They are
+        # indexed by the id of the option nodes and dropped whenever one of their targets is
+        # split. The option node and the row of each target are indexed by the id of the target.
+        self._option_arrays = {}
+        self._option_rows = {}
+        # Tree exported with to_c and shared object loaded with load_c
+        self._c_export = None
+        self._c_lib = None
 
     @property
     def n_option_nodes(self):
@@ -170,22 +706,509 @@ class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor):
             actual_root = self._new_leaf()
             self._n_active_leaves = 1
             self._root = OptionNode(1, 0, actual_root)
+            self._root_is_branch = True
+            self._dirty = True
+
+        # The rows of the option node arrays only have to follow the leaves once they exist
+        leaf = self._learning_leaf(x) if self._option_rows else None
         super().learn_one(x, y, sample_weight=sample_weight)
 
+        if leaf is not None:
+            self._refresh_option_row(leaf)
+
+    def _refresh_option_row(self, leaf):
+        """Copy the linear model of a leaf that has learnt into its option node arrays row."""
+        if id(leaf) in self._option_rows:
+            option_id, t = self._option_rows[id(leaf)]
+            arrays = self._option_arrays.get(option_id)
+            if arrays is not None and arrays.is_linear[t] and not _fill_option_row(arrays, t):
+                # The leaf model came across new features
+                del self._option_arrays[option_id]
+
+    def _learning_leaf(self, x):
+        """Return the leaf `learn_one` is going to update with `x`, if it already exists.
+
+        The sample follows the first path it takes, down to the most traversed path of the
+        branches whose feature is missing.
+
+        """
+        node = None
+        for aux in self._root.walk(x, until_leaf=False):
+            if aux is None:
+                break
+            node = aux
+        while isinstance(node, DTBranch) and not isinstance(node, OptionNode):
+            _, node = node.most_common_path()
+            if isinstance(node, DTBranch):
+                node = node.traverse(x, until_leaf=False)
+        return node
+
+    def learn_many(
+        self, X: pd.DataFrame, y: pd.Series, sample_weight: pd.Series = None
+    ):
+        """Update the tree with a mini-batch of samples.
+
+        The rows are routed all at once through the flattened tree, and each leaf is updated
+        with the rows it receives in a single call. Split attempts are deferred to the end of
+        the mini-batch, hence a leaf can see up to a mini-batch worth of samples past its grace
+        period before it splits. If the tree cannot be flattened, if `X` has non-numeric
+        columns or a single row, the rows are learned one by one with `learn_one`.
+
+        Only the routing and the target statistics are vectorized: the splitters and the leaf
+        models still process the rows of a leaf one at a time, which is most of the cost of
+        learning. The gain over `learn_one` therefore stays modest, and the overhead of
+        converting and routing the dataframe makes mini-batches of a handful of rows no faster
+        than `learn_one`.
+
+        Parameters
+        ----------
+        X
+            A dataframe of features, missing values being encoded as `NaN`.
+        y
+            A series of target values.
+        sample_weight
+            A series of sample weights. Each sample has a weight of 1 by default.
+
+        """
+        y = np.asarray(y, dtype=float)
+        if sample_weight is None:
+            w = np.ones(len(y))
+        else:
+            w = np.asarray(sample_weight, dtype=float)
+
+        if self._root is None:
+            actual_root = self._new_leaf()
+            self._n_active_leaves = 1
+            self._root = OptionNode(1, 0, actual_root)
+            self._root_is_branch = True
+            self._dirty = True
+
+        records = list(iter_records(X))
+        # A single row is learned the same way by learn_one, without the cost of routing
+        if len(records) > 1 and self._routing is None:
+            self._routing = self._flatten()
+        compiled = self._routing
+        if (
+            len(records) <= 1
+            or compiled is None
+            or not all(pd.api.types.is_numeric_dtype(dtype) for dtype in X.dtypes)
+        ):
+            for x, y_i, w_i in zip(records, y.tolist(), w.tolist()):
+                self.learn_one(x, y_i, sample_weight=w_i)
+            return
+
+        n_seen = self._train_weight_seen_by_model
+        self._train_weight_seen_by_model += float(w.sum())
+
+        # The records are already at hand, reindexing the dataframe costs more on small batches
+        X_arr = np.array(
+            [[x.get(f, np.nan) for f in compiled.features] for x in records], dtype=np.float64
+        ).reshape(len(records), len(compiled.features))
+        leaves = _route_compiled(compiled, X_arr)
+        order = np.argsort(leaves, kind="stable")
+        positions, starts = np.unique(leaves[order], return_index=True)
+
+        touched = []
+        for pos, rows in zip(positions, np.split(order, starts[1:])):
+            leaf = compiled.nodes[pos]
+            leaf.learn_many(
+                [records[i] for i in rows], y[rows], sample_weight=w[rows], tree=self
+            )
+            self._refresh_option_row(leaf)
+            touched.append((leaf, records[rows[-1]]))
+
+        if self._growth_allowed:
+            for leaf, x in touched:
+                if not leaf.is_active():
+                    continue
+                if leaf.depth >= self.max_depth:  # Max depth reached
+                    leaf.deactivate()
+                    self._n_active_leaves -= 1
+                    self._n_inactive_leaves += 1
+                    continue
+                weight_seen = leaf.total_weight
+                if weight_seen - leaf.last_split_attempt_at < self.grace_period:
+                    continue
+
+                # Find the parent of the leaf the same way learn_one does, through the path of
+                # one of the rows the leaf has received
+                p_node = None
+                node = None
+                path = iter(self._root.walk(x, until_leaf=False))
+                while True:
+                    aux = next(path, None)
+                    if aux is None:
+                        break
+                    p_node = node
+                    node = aux
+                if node is not leaf:
+                    continue
+                p_branch = p_node.branch_no(x) if isinstance(p_node, DTBranch) else None
+                self._attempt_to_split(leaf, p_node, p_branch)
+                leaf.last_split_attempt_at = weight_seen
+
+        period = self.memory_estimate_period
+        if n_seen // period != self._train_weight_seen_by_model // period:
+            self._estimate_model_size()
+
     def predict_one(self, x):
-        pred = 0.0
-        if self._root is not None:
-            found_nodes = [self._root]
-            if isinstance(self._root, DTBranch):
-                found_nodes = self._root.traverse(x, until_leaf=True)
-            if type(found_nodes) is not list:  # handle cases where
-                found_nodes = [found_nodes]
-            for leaf in found_nodes:
-                pred += leaf.prediction(x, tree=self)
-            # Mean prediction among the reached leaves
-            pred /= len(found_nodes)
-
-        return pred
+        if self._root is None:
+            return 0.0
+
+        if not self._root_is_branch:
+            return self._root.prediction(x, tree=self)
+        # Mean prediction among the reached leaves
+        total, count = sum_leaves(self._root, x, self, self._option_sum)
+        return total / count
+
+    def _option_sum(self, node, x, tree):
+        """Sum the predictions of the leaves reached below an option node.
+
+        The children of the option node are routed and the linear leaf models among the reached
+        nodes are evaluated with a single matrix-vector product, see `OptionArrays`. The rows of
+        the leaves are refreshed by `learn_one` as they learn.
+
+        """
+        arrays = self._option_arrays.get(id(node))
+        if arrays is None:
+            arrays = self._option_arrays[id(node)] = _option_arrays(node)
+            for t, target in enumerate(arrays.targets):
+                self._option_rows[id(target)] = id(node), t
+
+        x_vec = np.array([x.get(f, np.nan) for f in arrays.columns], dtype=float)
+        missing = np.isnan(x_vec)
+        # Each child owns two consecutive slots, the second one is for the right branch
+        pos = np.arange(0, len(arrays.slot), 2)
+        feat = arrays.feat
+        pos[arrays.tested] += x_vec[feat] > arrays.thr
+        if missing.any():
+            # The most traversed path depends on the weights of the leaves, it is looked up here
+            for j in arrays.tested[missing[feat]]:
+                pos[j] = 2 * j + node.children[j].most_common_path()[0]
+        reached = arrays.slot[pos]
+
+        on_linear = arrays.is_linear[reached]
+        linear = reached[on_linear]
+        total = 0.0
+        count = len(linear)
+        if count:
+            preds = arrays.W[linear] @ np.where(missing, 0.0, x_vec) + arrays.bias[linear]
+            # The linear leaves share the loss of their prototype
+            loss = arrays.targets[linear[0]]._leaf_model.loss  # noqa
+            total = float(loss.mean_func(preds).sum())
+        for t in reached[~on_linear]:
+            s, n = sum_leaves(arrays.targets[t], x, tree, self._option_sum)
+            total += s
+            count += n
+
+        return total, count
+
+    def predict_many(self, X: pd.DataFrame) -> pd.Series:
+        """Predict the target values of a mini-batch.
+
+        The tree is first flattened into arrays, which lets all the rows be routed at once. The
+        flattened tree is cached until the model learns again. Trees which cannot be flattened,
+        namely trees with nominal or multi-way splits or with leaf models that are not instances
+        of `river.linear_model.LinearRegression`, are evaluated with `predict_one`. If a shared
+        object has been loaded with `load_c` and the model has not learned since it was exported,
+        the shared object is used instead.
+
+        Parameters
+        ----------
+        X
+            A dataframe of features.
+
+        Returns
+        -------
+        Predicted target values.
+
+        """
+        if self._root is None:
+            return pd.Series(0.0, index=X.index)
+
+        if self._c_lib is not None and self._c_lib[0] == self._train_weight_seen_by_model:
+            _, features, c_predict_many = self._c_lib
+            X_arr = np.ascontiguousarray(
+                X.reindex(columns=features).to_numpy(dtype=np.float64)
+            )
+            y_pred = np.empty(len(X_arr))
+            c_predict_many(
+                X_arr.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+                len(X_arr),
+                y_pred.ctypes.data_as(ctypes.POINTER(ctypes.c_double)),
+            )
+            return pd.Series(y_pred, index=X.index)
+
+        if self._dirty:
+            self._compiled = self._compile()
+            self._compiled_seen = None
+            self._compiled_stamp = None
+            self._compiled_quantized = None
+            self._dirty = False
+
+        if self._compiled is None:
+            return pd.Series(
+                [self.predict_one(x) for x in iter_records(X)],
+                index=X.index,
+                dtype=float,
+            )
+
+        if self._compiled_stamp != self._train_weight_seen_by_model:
+            self._refresh_compiled()
+            self._compiled_stamp = self._train_weight_seen_by_model
+        compiled = self._compiled_quantized
+
+        # The inputs are compared with the thresholds in the precision of the latter
+        X_arr = X.reindex(columns=compiled.features).to_numpy(dtype=compiled.thr.dtype)
+        y_pred = _predict_compiled(compiled, X_arr, self.leaf_model.loss.mean_func)
+        return pd.Series(y_pred, index=X.index)
+
+    def _refresh_compiled(self):
+        """Copy the models of the leaves which have learned into the rows of the flattened tree,
+        and update its copy with the precision given by `predict_precision`."""
+        compiled = self._compiled
+        # The rows of the leaves follow the order in which the leaves are stored
+        leaves = [compiled.nodes[i] for i in compiled.perm[compiled.kind == _LEAF]]
+        seen = np.array([leaf.total_weight for leaf in leaves], dtype=float)
+        if self._compiled_seen is None:  # the rows have just been filled by _compile
+            stale = np.zeros(0, dtype=np.int64)
+        else:
+            stale = np.flatnonzero(seen != self._compiled_seen)
+        self._compiled_seen = seen
+
+        columns = {feature: j for j, feature in enumerate(compiled.features)}
+        new_features = {
+            feature
+            for row in stale
+            for feature in leaves[row]._leaf_model.weights  # noqa
+            if feature not in columns
+        }
+        if new_features:
+            # The new features get their own columns, the splits do not refer to them
+            for feature in new_features:
+                columns[feature] = len(columns)
+            leaf_w = np.zeros((len(leaves), len(columns)))
+            leaf_w[:, : compiled.leaf_w.shape[1]] = compiled.leaf_w
+            compiled = self._compiled = compiled._replace(
+                features=list(columns), leaf_w=leaf_w
+            )
+
+        for row in stale:
+            model = leaves[row]._leaf_model  # noqa
+            compiled.leaf_bias[row] = model.intercept
+            compiled.leaf_w[row] = 0.0
+            for feature, w in model.weights.items():
+                compiled.leaf_w[row, columns[feature]] = w
+
+        if self.predict_precision == self._FP64:
+            self._compiled_quantized = compiled
+        elif len(stale) or self._compiled_quantized is None or new_features:
+            self._compiled_quantized = _quantize(compiled, self.predict_precision)
+
+    def to_c(self, path: str) -> typing.List[base.typing.FeatureName]:
+        """Export the tree as C source code.
+
+        The generated file defines `double predict_one(const double *x)` and
+        `void predict_many(const double *X, long n, double *y)`, where `X` holds `n` rows stored
+        contiguously. The features must follow the order of the returned list, missing values
+        being encoded as `NAN`. It can be built with, for instance,
+        `cc -O3 -march=native -shared -fPIC tree.c -o tree.so` and used by `predict_many` once
+        loaded with `load_c`. Adding `-fopenmp` spreads the rows of `predict_many` over several
+        threads, whose number is controlled by the `OMP_NUM_THREADS` environment variable.
+
+        Parameters
+        ----------
+        path
+            Where to write the C source code.
+
+        Returns
+        -------
+        The features, in the order expected by the generated functions.
+
+        """
+        loss = getattr(self.leaf_model, "loss", None)
+        if (
+            self._root is None
+            or not isinstance(loss, optim.losses.RegressionLoss)
+            or type(loss).mean_func is not optim.losses.RegressionLoss.mean_func
+        ):
+            raise NotImplementedError(
+                "Only fitted trees whose leaf models use an identity mean function can be exported."
+            )
+
+        # The export is exact, whatever the precision used by predict_many
+        compiled = self._compile()
+        if compiled is None:
+            raise NotImplementedError(
+                "Trees with nominal or multi-way splits, or with leaf models other than "
+                "linear_model.LinearRegression, cannot be exported."
+            )
+
+        with open(path, "w") as f:
+            f.write(_emit_c(compiled))
+
+        self._c_export = (self._train_weight_seen_by_model, compiled.features)
+        return compiled.features
+
+    def load_c(self, path: str):
+        """Load a shared object built from the source code generated by `to_c`.
+
+        `predict_many` calls the shared object as long as the model does not learn. Once it does,
+        the Python implementation is used again.
+
+        Parameters
+        ----------
+        path
+            Path of the shared object.
+
+        """
+        if self._c_export is None:
+            raise RuntimeError("The tree has not been exported with to_c.")
+
+        c_predict_many = ctypes.CDLL(path).predict_many
+        c_predict_many.argtypes = [
+            ctypes.POINTER(ctypes.c_double),
+            ctypes.c_long,
+            ctypes.POINTER(ctypes.c_double),
+        ]
+        c_predict_many.restype = None
+        stamp, features = self._c_export
+        self._c_lib = (stamp, features, c_predict_many)
+
+    def __getstate__(self):
+        # Shared libraries cannot be pickled, they have to be loaded again
+        state = self.__dict__.copy()
+        state["_c_lib"] = None
+        # The option arrays are indexed by the ids of the nodes, which change with the copies
+        state["_option_arrays"] = {}
+        state["_option_rows"] = {}
+        return state
+
+    def _estimate_model_size(self):
+        # The arrays used for prediction and for routing are copies of the tree and can be rebuilt
+        # at any time, hence they are not part of the size of the model
+        caches = {name: getattr(self, name) for name in self._CACHES}
+        for name in caches:
+            setattr(self, name, None)
+        try:
+            super()._estimate_model_size()
+        finally:
+            for name, value in caches.items():
+                setattr(self, name, value)
+
+    def _drop_option_arrays(self, leaf):
+        """Drop the arrays of the option node which has `leaf` among its targets, if any."""
+        option_id, _ = self._option_rows.pop(id(leaf), (None, None))
+        self._option_arrays.pop(option_id, None)
+
+    def _flatten(self) -> typing.Optional[CompiledTree]:
+        """Flatten the structure of the tree into a `CompiledTree`, in depth-first order.
+
+        The leaf models are left out. Returns `None` if the tree contains branches which have no
+        flat equivalent.
+
+        """
+        # Number the nodes in depth-first order, the root gets index 0. Each node is stacked
+        # along with the index of its parent, -1 for the root, and its side, -1 standing for the
+        # children of option nodes.
+        nodes = []
+        kind = []
+        feat = []
+        thr = []
+        left = []
+        right = []
+        options = {}
+        features = {}
+        n_leaves = 0
+        stack = [(self._root, -1, 0)]
+        while stack:
+            node, parent, side = stack.pop()
+            i = len(nodes)
+            nodes.append(node)
+            if parent >= 0:
+                if side < 0:
+                    options[parent].append(i)
+                elif side == 0:
+                    left[parent] = i
+                else:
+                    right[parent] = i
+
+            if isinstance(node, OptionNode):
+                kind.append(_OPTION)
+                feat.append(0)
+                thr.append(0.0)
+                options[i] = []
+                stack.extend((child, i, -1) for child in reversed(node.children))
+            elif isinstance(node, NumericBinaryBranch):
+                kind.append(_SPLIT)
+                feat.append(features.setdefault(node.feature, len(features)))
+                thr.append(node.threshold)
+                stack.append((node.children[1], i, 1))
+                stack.append((node.children[0], i, 0))
+            elif isinstance(node, HTLeaf):
+                kind.append(_LEAF)
+                feat.append(0)
+                thr.append(0.0)
+            else:
+                return None
+            # The leaves hold the row of their model in left
+            left.append(n_leaves if kind[-1] == _LEAF else 0)
+            n_leaves += kind[-1] == _LEAF
+            right.append(0)
+
+        # The option nodes are numbered in increasing order, as are their children
+        sizes = np.zeros(len(nodes), dtype=np.int64)
+        sizes[list(options)] = [len(children) for children in options.values()]
+        opt_ptr = np.concatenate(([0], np.cumsum(sizes)))
+        opt_idx = [child for children in options.values() for child in children]
+
+        return CompiledTree(
+            features=list(features),
+            kind=np.array(kind, dtype=np.int8),
+            feat=np.array(feat, dtype=np.int64),
+            thr=np.array(thr, dtype=float),
+            left=np.array(left, dtype=np.int64),
+            right=np.array(right, dtype=np.int64),
+            leaf_bias=np.zeros(0),
+            leaf_w=np.zeros((0, len(features))),
+            opt_ptr=opt_ptr,
+            opt_idx=np.array(opt_idx, dtype=np.int64),
+            nodes=nodes,
+        )
+
+    def _compile(self) -> typing.Optional[CompiledTree]:
+        """Flatten the tree into a `CompiledTree` in double precision, laid out in van Emde Boas
+        order.
+
+        Returns `None` if the tree contains nodes which have no flat equivalent.
+
+        """
+        compiled = self._flatten()
+        if compiled is None:
+            return None
+
+        leaves = [compiled.nodes[i] for i in np.flatnonzero(compiled.kind == _LEAF)]
+        features = {feature: j for j, feature in enumerate(compiled.features)}
+        for leaf in leaves:
+            if not (
+                isinstance(leaf, LeafModel)
+                and isinstance(leaf._leaf_model, linear_model.LinearRegression)  # noqa
+            ):
+                return None
+            for feature in leaf._leaf_model.weights:  # noqa
+                features.setdefault(feature, len(features))
+
+        # The leaves are numbered in depth-first order, as are their rows
+        leaf_bias = np.array([leaf._leaf_model.intercept for leaf in leaves], dtype=float)  # noqa
+        leaf_w = np.zeros((len(leaves), len(features)))
+        for i, leaf in enumerate(leaves):
+            for feature, w in leaf._leaf_model.weights.items():  # noqa
+                leaf_w[i, features[feature]] = w
+
+        compiled = compiled._replace(
+            features=list(features), leaf_bias=leaf_bias, leaf_w=leaf_w
+        )
+        return _relayout_veb(compiled)
 
     def _new_leaf(self, initial_stats=None, parent=None, is_active=True):
         """Create a new learning node.
@@ -197,14 +1220,18 @@ class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor):
         else:
             depth = 0
 
-        leaf_model = None
-        if parent is None:
-            leaf_model = deepcopy(self.leaf_model)
+        parent_model = getattr(parent, "_leaf_model", None)
+        if parent_model is None:
+            if self._leaf_model_proto is None:
+                self._leaf_model_proto = _prototype(self.leaf_model)
+            proto = self._leaf_model_proto
         else:
-            try:
-                leaf_model = deepcopy(parent._leaf_model)  # noqa
-            except AttributeError:
-                leaf_model = deepcopy(self.leaf_model)
+            # A leaf stops learning once it is split, hence its model only needs to be
+            # serialized once for all the leaves that inherit from it
+            if self._parent_proto is None or self._parent_proto[0] is not parent_model:
+                self._parent_proto = (parent_model, _prototype(parent_model))
+            proto = self._parent_proto[1]
+        leaf_model = proto()
 
         return LeafModel(
             initial_stats,
@@ -248,43 +1275,44 @@ class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor):
         """
         split_criterion = self._new_split_criterion()
         best_split_suggestions = leaf.best_split_suggestions(split_criterion, self)
+        # Most attempts which do not end in a split end in an option split, which needs all the
+        # candidates in order
         best_split_suggestions.sort()
         should_split = False
         should_option_split = False
         if len(best_split_suggestions) < 2:
             should_split = len(best_split_suggestions) > 0
+            best_suggestion = best_split_suggestions[-1] if should_split else None
         else:
+            best_suggestion = best_split_suggestions[-1]
+            second_best_suggestion = best_split_suggestions[-2]
             hoeffding_bound = self._hoeffding_bound(
                 split_criterion.range_of_merit(leaf.stats),
                 self.split_confidence,
                 leaf.total_weight,
             )
-            best_suggestion = best_split_suggestions[-1]
-            second_best_suggestion = best_split_suggestions[-2]
-            if best_suggestion.merit > 0.0 and (
-                    second_best_suggestion.merit / best_suggestion.merit
-                    < 1 - hoeffding_bound
-                    or hoeffding_bound < self.tie_threshold
-            ):
-                should_split = True
+            merits = None
+            if self.remove_poor_attrs:
+                merits = np.fromiter(
+                    (suggestion.merit for suggestion in best_split_suggestions),
+                    dtype=np.float64,
+                    count=len(best_split_suggestions),
+                )
+            should_split, should_option_split, poor_mask = _decide(
+                best_suggestion.merit,
+                second_best_suggestion.merit,
+                hoeffding_bound,
+                self.tie_threshold,
+                merits,
+            )
             if self.remove_poor_attrs:
-                poor_attrs = set()
-                best_ratio = second_best_suggestion.merit / best_suggestion.merit
-
-                # Add any poor attribute to set
-                for suggestion in best_split_suggestions:
-                    if (
-                            suggestion.feature
-                            and suggestion.merit / best_suggestion.merit
-                            < best_ratio - 2 * hoeffding_bound
-                    ):
-                        poor_attrs.add(suggestion.feature)
-                for poor_att in poor_attrs:
-                    leaf.disable_attribute(poor_att)
-            if not should_split:  # if multiple competitive split candidates, no clear winner
-                should_option_split = True
+                # Only the poor candidates are visited, there is one candidate per feature
+                for i in np.flatnonzero(poor_mask):
+                    poor_att = best_split_suggestions[i].feature
+                    if poor_att:
+                        leaf.disable_attribute(poor_att)
         if should_split:
-            split_decision = best_split_suggestions[-1]
+            split_decision = best_suggestion
             if split_decision.feature is None:
                 # Pre-pruning - null wins
                 leaf.deactivate()
@@ -298,14 +1326,21 @@ class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor):
                     self._new_leaf(initial_stats, parent=leaf)
                     for initial_stats in split_decision.children_stats
                 )
+                self._parent_proto = None
                 new_split = split_decision.assemble(
                     branch, leaf.stats, leaf.depth, *leaves, **kwargs
                 )
+                # The new leaves took ownership of the children statistics, without copies
+                del split_decision.children_stats
 
                 self._n_active_leaves -= 1
                 self._n_active_leaves += len(leaves)
+                self._routing = None
+                self._dirty = True
+                self._drop_option_arrays(leaf)
                 if parent is None:
                     self._root = new_split
+                    self._root_is_branch = True
                 else:
                     parent.children[parent_branch] = new_split
 
@@ -315,7 +1350,8 @@ class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor):
             option_node = OptionNode(len(best_split_suggestions),
                                      leaf.depth + 1)  # option node at same depth as its children
             self._n_active_leaves -= 1
-            for split_decision in best_split_suggestions[1:]:  # first suggestion is always null split
+            # The first candidate is always the null split
+            for split_decision in best_split_suggestions[1:]:
                 branch = self._branch_selector(
                     split_decision.numerical_feature, split_decision.multiway_split
                 )
@@ -326,10 +1362,16 @@ class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor):
                 new_split = split_decision.assemble(
                     branch, leaf.stats, leaf.depth, *leaves, **kwargs
                 )
+                del split_decision.children_stats
                 option_node.children.append(new_split)
                 self._n_active_leaves += len(leaves)
+            self._parent_proto = None
+            self._routing = None
+            self._dirty = True
+            self._drop_option_arrays(leaf)
             if parent is None:
                 self._root = option_node
+                self._root_is_branch = True
             else:
                 parent.children[parent_branch] = option_node
 
@@ -337,17 +1379,12 @@ class HoeffdingOptionTreeRegressor(HoeffdingTreeRegressor):
             self._enforce_size_limit()
         elif (
                 len(best_split_suggestions) >= 2
-                and best_split_suggestions[-1].merit > 0
-                and best_split_suggestions[-2].merit > 0
+                and best_suggestion.merit > 0
+                and second_best_suggestion.merit > 0
         ):
-            last_check_ratio = (
-                    best_split_suggestions[-2].merit / best_split_suggestions[-1].merit
-            )
-            last_check_vr = best_split_suggestions[-1].merit
+            last_check_ratio = second_best_suggestion.merit / best_suggestion.merit
+            last_check_vr = best_suggestion.merit
 
             leaf.manage_memory(
                 split_criterion, last_check_ratio, last_check_vr, hoeffding_bound
             )
-
-        if any([True for leaf in leaves if not isinstance(leaf, LeafModel)]):
-            print('debug')
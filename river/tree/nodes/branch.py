@@ -1,17 +1,21 @@
 import abc
+import itertools
 import math
 
 from ..base import Branch
 
 
 class DTBranch(Branch):
+    __slots__ = ["stats"]
+
     def __init__(self, stats, *children, **attributes):
         super().__init__(*children)
         # The number of branches can increase in runtime
         self.children = list(self.children)
 
         self.stats = stats
-        self.__dict__.update(attributes)
+        for name, value in attributes.items():
+            setattr(self, name, value)
 
     @property
     def total_weight(self):
@@ -66,6 +70,8 @@ class OptionNode(DTBranch):
         Other parameters passed to the learning node.
     """
 
+    __slots__ = ["num_options", "depth"]
+
     def __init__(self, num_options, depth, *children, **kwargs):
         super().__init__(None, *children)
         self.num_options = num_options
@@ -110,14 +116,7 @@ class OptionNode(DTBranch):
             feature categories.
         """
 
-        found_nodes = []
-        prev = None
-        for node in self.walk(x, until_leaf):
-            if node is None and prev is not None:
-                found_nodes.append(prev)
-            prev = node
-
-        return found_nodes
+        return reached_leaves(self, x, until_leaf)
 
     def branch_no(self, x):
         pass
@@ -145,6 +144,8 @@ class OptionNode(DTBranch):
 
 
 class NumericBinaryBranch(DTBranch):
+    __slots__ = ["feature", "threshold", "depth"]
+
     def __init__(self, stats, feature, threshold, depth, left, right, **attributes):
         super().__init__(stats, left, right, **attributes)
         self.feature = feature
@@ -182,6 +183,8 @@ class NumericBinaryBranch(DTBranch):
 
 
 class NominalBinaryBranch(DTBranch):
+    __slots__ = ["feature", "value", "depth"]
+
     def __init__(self, stats, feature, value, depth, left, right, **attributes):
         super().__init__(stats, left, right, **attributes)
         self.feature = feature
@@ -220,6 +223,8 @@ class NominalBinaryBranch(DTBranch):
 
 
 class NumericMultiwayBranch(DTBranch):
+    __slots__ = ["feature", "radius", "depth", "_mapping", "_r_mapping"]
+
     def __init__(
         self, stats, feature, radius_and_slots, depth, *children, **attributes
     ):
@@ -271,6 +276,8 @@ class NumericMultiwayBranch(DTBranch):
 
 
 class NominalMultiwayBranch(DTBranch):
+    __slots__ = ["feature", "depth", "_mapping", "_r_mapping"]
+
     def __init__(self, stats, feature, feature_values, depth, *children, **attributes):
         super().__init__(stats, *children, **attributes)
         self.feature = feature
@@ -310,3 +317,56 @@ class NominalMultiwayBranch(DTBranch):
     @property
     def repr_split(self):
         return f"{self.feature} in {set(self._mapping.keys())}"
+
+
+def reached_leaves(node, x, until_leaf=True):
+    """Return the list of leaves reached by `x` from `node`, whatever the type of `node`.
+
+    Option nodes yield `None` after the path of each of their children. The last node before
+    each `None` is a reached leaf. A final `None` accounts for paths that do not end below an
+    option node.
+    """
+    found_nodes = []
+    prev = None
+    for node in itertools.chain(node.walk(x, until_leaf), [None]):
+        if node is None and prev is not None:
+            found_nodes.append(prev)
+        prev = node
+
+    return found_nodes
+
+
+def sum_leaves(node, x, tree, option_sum=None):
+    """Sum the predictions of the leaves reached by `x` from `node`, without gathering them.
+
+    Parameters
+    ----------
+    node
+        The node to start from, whatever its type.
+    x
+        The input instance.
+    tree
+        The tree the node belongs to.
+    option_sum
+        The function called as `option_sum(option_node, x, tree)` to evaluate the option nodes.
+        By default, the leaves reached from each of their children are summed.
+
+    Returns
+    -------
+    The sum of the predictions and the number of leaves reached.
+    """
+    while isinstance(node, DTBranch):
+        if isinstance(node, OptionNode):
+            if option_sum is not None:
+                return option_sum(node, x, tree)
+            total, count = 0.0, 0
+            for child in node.children:
+                s, n = sum_leaves(child, x, tree)
+                total += s
+                count += n
+            return total, count
+        try:
+            node = node.next(x)
+        except KeyError:
+            _, node = node.most_common_path()
+    return node.prediction(x, tree=tree), 1
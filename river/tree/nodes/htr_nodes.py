@@ -1,5 +1,7 @@
 import inspect
 
+import numpy as np
+
 from river.stats import Var
 
 from ..splitter import EBSTSplitter
@@ -65,6 +67,16 @@ class LeafMean(HTLeaf):
     def update_stats(self, y, sample_weight):
         self.stats.update(y, sample_weight)
 
+    def update_stats_many(self, y, sample_weight):
+        n = float(sample_weight.sum())
+        if n <= 0:
+            return
+        # Summarize the batch in a Var and merge it with the current statistics
+        ddof = self.stats.ddof
+        mean = float(np.dot(sample_weight, y)) / n
+        S = float(np.dot(sample_weight, (y - mean) ** 2))
+        self.stats += Var._from_state(n, mean, S / (n - ddof) if n != ddof else 0.0, ddof=ddof)
+
     def prediction(self, x, *, tree=None):
         return self.stats.mean.get()
 
@@ -140,6 +152,17 @@ class LeafModel(LeafMean):
             for _ in range(int(sample_weight)):
                 self._leaf_model.learn_one(x, y)
 
+    def learn_many(self, records, y, *, sample_weight, tree=None):
+        super().learn_many(records, y, sample_weight=sample_weight, tree=tree)
+
+        # The model keeps learning sample by sample, as with learn_one
+        for x, y_i, w_i in zip(records, y.tolist(), sample_weight.tolist()):
+            if self._model_supports_weights:
+                self._leaf_model.learn_one(x, y_i, w_i)
+            else:
+                for _ in range(int(w_i)):
+                    self._leaf_model.learn_one(x, y_i)
+
     def prediction(self, x, *, tree=None):
         return self._leaf_model.predict_one(x)
 
@@ -183,6 +206,11 @@ class LeafAdaptive(LeafModel):
 
         super().learn_one(x, y, sample_weight=sample_weight, tree=tree)
 
+    def learn_many(self, records, y, *, sample_weight, tree=None):
+        # The errors of both predictors are tracked sample by sample
+        for x, y_i, w_i in zip(records, y.tolist(), sample_weight.tolist()):
+            self.learn_one(x, y_i, sample_weight=w_i, tree=tree)
+
     def prediction(self, x, *, tree=None):
         if self._fmse_mean < self._fmse_model:  # Act as a regression tree
             return self.stats.mean.get()
@@ -173,6 +173,34 @@ class HTLeaf(Leaf, abc.ABC):
         if self.is_active():
             self.update_splitters(x, y, sample_weight, tree.nominal_attributes)
 
+    def update_stats_many(self, y, sample_weight):
+        for y_i, w_i in zip(y.tolist(), sample_weight.tolist()):
+            self.update_stats(y_i, w_i)
+
+    def learn_many(self, records, y, *, sample_weight, tree=None):
+        """Update the node with a mini-batch of samples.
+
+        Parameters
+        ----------
+        records
+            Sample attributes, as a list of dictionaries.
+        y
+            Target values, as an array.
+        sample_weight
+            Sample weights, as an array.
+        tree
+            Tree to update.
+
+        Notes
+        -----
+        The target statistics are updated at once through `update_stats_many`, whereas the
+        splitters are still updated one sample at a time.
+        """
+        self.update_stats_many(y, sample_weight)
+        if self.is_active():
+            for x, y_i, w_i in zip(records, y.tolist(), sample_weight.tolist()):
+                self.update_splitters(x, y_i, w_i, tree.nominal_attributes)
+
     @abc.abstractmethod
     def prediction(self, x, *, tree=None) -> dict:
         pass
@@ -19,6 +19,7 @@ from .ebst_splitter import EBSTSplitter
 from .exhaustive_splitter import ExhaustiveSplitter
 from .gaussian_splitter import GaussianSplitter
 from .histogram_splitter import HistogramSplitter
+from .histogram_splitter_reg import HistogramSplitterReg
 from .qo_splitter import QOSplitter
 from .sgt_quantizer import DynamicQuantizer, StaticQuantizer
 from .tebst_splitter import TEBSTSplitter
@@ -29,6 +30,7 @@ __all__ = [
     "ExhaustiveSplitter",
     "GaussianSplitter",
     "HistogramSplitter",
+    "HistogramSplitterReg",
     "QOSplitter",
     "Quantizer",
     "Splitter",
@@ -0,0 +1,198 @@
+import math
+
+import numpy as np
+
+from river.stats import Var
+
+from ..split_criterion import VarianceReductionSplitCriterion
+from ..utils import BranchFactory
+from .base import Splitter
+
+
+class HistogramSplitterReg(Splitter):
+    """Histogram-based splitter for regression tasks.
+
+    The range of the monitored feature is partitioned into `n_bins` bins of equal width. Each bin
+    keeps the total weight of the samples that fall into it, as well as the weighted sums of
+    their targets and squared targets. The split candidates lie between consecutive non-empty
+    bins. They are all evaluated at once through cumulative sums over the bins, hence the cost
+    of a split attempt depends on the number of bins rather than on the number of observed
+    values, as is the case with `EBSTSplitter`.
+
+    The bins adapt to the data observed by each leaf. The range of the histogram is set from the
+    first two distinct values. Whenever a value falls outside of the range, neighbouring bins are
+    merged in pairs, which doubles their width, until the value fits. The targets are summed
+    relative to the first observed target to limit the loss of precision when the variances are
+    computed.
+
+    This splitter only supports single-target regression.
+
+    Parameters
+    ----------
+    n_bins
+        The number of bins, which must be an even number.
+
+    """
+
+    def __init__(self, n_bins: int = 64):
+        super().__init__()
+
+        if n_bins < 2 or n_bins % 2:
+            raise ValueError("'n_bins' must be an even number greater than or equal to 2.")
+        self.n_bins = n_bins
+
+        # Weight, sum of the targets and sum of the squared targets in each bin
+        self._stats = np.zeros((self.n_bins, 3))
+        # Smallest and largest feature values in each bin
+        self._x_range = np.tile([math.inf, -math.inf], (self.n_bins, 1))
+        self._low = None
+        self._width = None
+        self._y_ref = None
+
+    @property
+    def is_target_class(self) -> bool:
+        return False
+
+    def update(self, att_val, target_val, sample_weight):
+        if att_val is None or not math.isfinite(att_val):
+            return
+
+        if self._low is None:
+            self._low = att_val
+            self._y_ref = target_val
+            i = 0
+        elif self._width is None:
+            # Only one distinct value has been observed so far, and it lies in the first bin
+            if att_val == self._low:
+                i = 0
+            else:
+                self._init_range(att_val)
+                i = self._bin(att_val)
+        else:
+            i = self._bin(att_val)
+            while i < 0 or i >= self.n_bins:
+                self._grow(upwards=i >= self.n_bins)
+                i = self._bin(att_val)
+
+        dy = target_val - self._y_ref
+        stats = self._stats[i]
+        stats[0] += sample_weight
+        stats[1] += sample_weight * dy
+        stats[2] += sample_weight * dy * dy
+        x_range = self._x_range[i]
+        if att_val < x_range[0]:
+            x_range[0] = att_val
+        if att_val > x_range[1]:
+            x_range[1] = att_val
+
+    def _bin(self, att_val):
+        return math.floor((att_val - self._low) / self._width)
+
+    def _init_range(self, att_val):
+        # The two observed values are half of the range apart
+        half = self.n_bins // 2
+        if att_val > self._low:
+            self._width = (att_val - self._low) / half
+        else:
+            first = self._low
+            self._width = (first - att_val) / half
+            self._low = att_val
+            # Move the first value to the bin it is mapped to from now on
+            i = min(self._bin(first), self.n_bins - 1)
+            self._stats[i] = self._stats[0]
+            self._stats[0] = 0.0
+            self._x_range[i] = self._x_range[0]
+            self._x_range[0] = [math.inf, -math.inf]
+
+    def _grow(self, upwards):
+        half = self.n_bins // 2
+        stats = self._stats.reshape(half, 2, 3).sum(axis=1)
+        x_low = self._x_range[:, 0].reshape(half, 2).min(axis=1)
+        x_high = self._x_range[:, 1].reshape(half, 2).max(axis=1)
+
+        self._stats[:] = 0.0
+        self._x_range[:] = [math.inf, -math.inf]
+        if upwards:
+            kept = slice(0, half)
+        else:
+            kept = slice(half, self.n_bins)
+            self._low -= self.n_bins * self._width
+        self._stats[kept] = stats
+        self._x_range[kept, 0] = x_low
+        self._x_range[kept, 1] = x_high
+        self._width *= 2
+
+    def cond_proba(self, att_val, target_val):
+        """Not implemented in regression splitters."""
+        raise NotImplementedError
+
+    def best_evaluated_split_suggestion(
+        self, criterion, pre_split_dist, att_idx, binary_only=True
+    ):
+        candidate = BranchFactory()
+
+        filled = np.flatnonzero(self._stats[:, 0] > 0)
+        if len(filled) < 2:
+            return candidate
+
+        # Statistics of the left branch for each split point, the right branch gets the rest
+        left = np.cumsum(self._stats[filled], axis=0)[:-1]
+        n_left = left[:, 0]
+        mean_left = left[:, 1] / n_left
+        S_left = np.maximum(left[:, 2] - left[:, 1] * mean_left, 0.0)
+        mean_left += self._y_ref
+
+        n = pre_split_dist.mean.n
+        n_right = n - n_left
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_right = (n * pre_split_dist.mean.get() - n_left * mean_left) / n_right
+            S_right = (
+                pre_split_dist._S
+                - S_left
+                - (mean_left - mean_right) ** 2 * n_left * n_right / n
+            )
+
+        if type(criterion) is VarianceReductionSplitCriterion:
+            ddof = pre_split_dist.ddof
+            with np.errstate(divide="ignore", invalid="ignore"):
+                var_left = np.where(n_left > ddof, S_left / (n_left - ddof), 0.0)
+                var_right = np.where(n_right > ddof, S_right / (n_right - ddof), 0.0)
+            merits = np.where(
+                (n_left >= criterion.min_samples_split)
+                & (n_right >= criterion.min_samples_split),
+                pre_split_dist.get() - (n_left * var_left + n_right * var_right) / n,
+                0.0,
+            )
+            best = int(np.argmax(merits))
+            merit = float(merits[best])
+            post_split_dist = self._post_split_dist(
+                pre_split_dist, n_left[best], mean_left[best], S_left[best]
+            )
+        else:
+            # Other criteria are evaluated one split point at a time
+            best = None
+            for i in range(len(n_left)):
+                dist = self._post_split_dist(pre_split_dist, n_left[i], mean_left[i], S_left[i])
+                merit_i = criterion.merit_of_split(pre_split_dist, dist)
+                if best is None or merit_i > merit:
+                    best, merit, post_split_dist = i, merit_i, dist
+
+        split_point = (
+            self._x_range[filled[best], 1] + self._x_range[filled[best + 1], 0]
+        ) / 2.0
+        return BranchFactory(
+            merit,
+            att_idx,
+            float(split_point),
+            post_split_dist,
+            numerical_feature=True,
+            multiway_split=False,
+        )
+
+    @staticmethod
+    def _post_split_dist(pre_split_dist, n_left, mean_left, S_left):
+        ddof = pre_split_dist.ddof
+        n_left = float(n_left)
+        sig = float(S_left) / (n_left - ddof) if n_left != ddof else 0.0
+        left = Var._from_state(n_left, float(mean_left), sig, ddof=ddof)
+        return [left, pre_split_dist - left]
@@ -1,6 +1,11 @@
+import math
+import random
+
+import numpy as np
 import pytest
 
-from river import datasets, synth, tree
+from river import datasets, stats, synth, tree, utils
+from river.tree.split_criterion import VarianceReductionSplitCriterion
 
 
 def get_regression_data():
@@ -33,6 +38,7 @@ def test_class_splitter(dataset, splitter):
         (get_regression_data(), tree.splitter.TEBSTSplitter()),
         (get_regression_data(), tree.splitter.QOSplitter()),
         (get_regression_data(), tree.splitter.QOSplitter(allow_multiway_splits=True)),
+        (get_regression_data(), tree.splitter.HistogramSplitterReg()),
     ],
 )
 def test_reg_splitter(dataset, splitter):
@@ -65,3 +71,31 @@ def test_nominal_reg_splitter():
         model.learn_one(x, y)
 
     assert model.height > 0
+
+
+def test_histogram_splitter_reg():
+    # Each distinct value gets its own bin, hence the same split merit as EBST
+    rng = random.Random(42)
+    hist, ebst = tree.splitter.HistogramSplitterReg(n_bins=64), tree.splitter.EBSTSplitter()
+    pre_split_dist = stats.Var()
+    for _ in range(1000):
+        x = rng.randint(-20, 40)
+        y = (5.0 if x > 7 else 0.0) + rng.gauss(0, 1)
+        hist.update(x, y, 1.0)
+        ebst.update(x, y, 1.0)
+        pre_split_dist.update(y)
+
+    criterion = VarianceReductionSplitCriterion(min_samples_split=5)
+    h = hist.best_evaluated_split_suggestion(criterion, pre_split_dist, "x")
+    e = ebst.best_evaluated_split_suggestion(criterion, pre_split_dist, "x")
+    assert math.isclose(h.merit, e.merit)
+    assert 7 <= h.split_info < 8
+    for h_dist, e_dist in zip(h.children_stats, e.children_stats):
+        assert math.isclose(h_dist.get(), e_dist.get())
+
+    # The bins are accounted for by the size of their buffers, not element by element
+    n_bytes = sum(v.nbytes for v in vars(hist).values() if isinstance(v, np.ndarray))
+    assert utils.skmultiflow_utils.calculate_object_size(hist) < 2 * n_bytes
+
+    with pytest.raises(ValueError):
+        tree.splitter.HistogramSplitterReg(n_bins=1)
@@ -1,8 +1,12 @@
+import math
 import random
+import shutil
+import subprocess
 
+import pandas as pd
 import pytest
 
-from river import datasets, synth, tree
+from river import compose, datasets, linear_model, synth, tree, utils
 
 
 def get_classification_data():
@@ -181,3 +185,293 @@ def test_drift_adaptation_hatr():
         model.learn_one(x, y_)
 
     assert model._n_alternate_trees > 0
+
+
+def test_hotr_unpicklable_leaf_model(tmp_path):
+    # The leaf models are deep-copied when they cannot be pickled
+    model = tree.HoeffdingOptionTreeRegressor(
+        grace_period=50,
+        leaf_model=compose.FuncTransformer(lambda x: x) | linear_model.LinearRegression(),
+    )
+    dataset = list(get_regression_data())
+    for x, y in dataset:
+        assert isinstance(model.predict_one(x), float)
+        model.learn_one(x, y)
+
+    assert model.n_nodes > 2
+    # The prototype of the split leaf is dropped once the split is done
+    assert model._parent_proto is None
+
+    # Such leaf models cannot be flattened, predict_many falls back on predict_one
+    X = pd.DataFrame([x for x, _ in dataset[:20]])
+    for x, yp in zip(X.to_dict(orient="records"), model.predict_many(X)):
+        assert math.isclose(model.predict_one(x), yp)
+
+    # Nor can they be exported
+    with pytest.raises(NotImplementedError):
+        model.to_c(str(tmp_path / "tree.c"))
+
+
+def test_hotr_predict_many():
+    dataset = list(get_regression_data())
+
+    model = tree.HoeffdingOptionTreeRegressor(grace_period=50)
+    for x, y in dataset:
+        model.learn_one(x, y)
+
+    X = pd.DataFrame([x for x, _ in dataset])
+    # Missing features follow the most traversed path
+    X[0] = X[0].mask(X.index % 7 == 0)
+
+    y_pred = model.predict_many(X)
+    for (i, x), yp in zip(X.iterrows(), y_pred):
+        x = {k: v for k, v in x.items() if not math.isnan(v)}
+        assert math.isclose(model.predict_one(x), yp, rel_tol=1e-9)
+
+    # The leaf models are stored apart from the nodes, one row per leaf
+    assert len(model._compiled.leaf_w) == model.n_leaves < len(model._compiled.kind)
+
+
+def test_hotr_predict_many_fallback_missing_values():
+    # Nominal splits cannot be flattened, the rows are then predicted one by one
+    rng = random.Random(42)
+    dataset = [({**x, "c": rng.randint(0, 1)}, y) for x, y in get_regression_data()]
+    dataset = [(x, y + 10 * x["c"]) for x, y in dataset]
+
+    model = tree.HoeffdingOptionTreeRegressor(grace_period=50, nominal_attributes=["c"])
+    for x, y in dataset:
+        model.learn_one(x, y)
+
+    X = pd.DataFrame([x for x, _ in dataset[:50]])
+    X[0] = X[0].mask(X.index % 3 == 0)
+    y_pred = model.predict_many(X)
+    assert model._compiled is None
+    for x, yp in zip(X.to_dict(orient="records"), y_pred):
+        x = {k: v for k, v in x.items() if not math.isnan(v)}
+        assert math.isclose(model.predict_one(x), yp)
+
+
+@pytest.mark.parametrize("precision", ["fp64", "fp32"])
+def test_hotr_predict_many_while_learning(precision):
+    dataset = list(get_regression_data())
+    X = pd.DataFrame([x for x, _ in dataset[:100]])
+
+    model = tree.HoeffdingOptionTreeRegressor(grace_period=50, predict_precision=precision)
+    n_splits = 0
+    for i, (x, y) in enumerate(dataset):
+        model.learn_one(x, y)
+        if i % 25:
+            continue
+        structure = model._compiled
+        y_pred = model.predict_many(X)
+        for x_, yp in zip(X.to_dict(orient="records"), y_pred):
+            assert math.isclose(model.predict_one(x_), yp, rel_tol=1e-4)
+        # Only the rows of the leaves are refreshed as long as the structure does not change
+        n_splits += model._compiled is not structure
+    assert 1 < n_splits < len(dataset) // 25
+
+    # The leaf models may come across features the splits do not use
+    model.grace_period = math.inf
+    for x, y in dataset[:50]:
+        model.learn_one({**x, "extra": 1.0}, y)
+    X["extra"] = 1.0
+    y_pred = model.predict_many(X)
+    for x, yp in zip(X.to_dict(orient="records"), y_pred):
+        assert math.isclose(model.predict_one(x), yp, rel_tol=1e-4)
+
+    # The flattened tree is not part of the size of the model
+    model._estimate_model_size()
+    fraction = model._size_estimate_overhead_fraction
+    model._compiled = model._compiled_quantized = model._compiled_seen = None
+    model._dirty = True
+    model._estimate_model_size()
+    assert model._size_estimate_overhead_fraction == fraction
+
+
+@pytest.mark.parametrize("precision, tol", [("fp32", 1e-4), ("bf16", 1e-1)])
+def test_hotr_predict_many_precision(precision, tol):
+    dataset = list(get_regression_data())
+
+    model = tree.HoeffdingOptionTreeRegressor(
+        grace_period=50, predict_precision=precision
+    )
+    for x, y in dataset:
+        model.learn_one(x, y)
+
+    X = pd.DataFrame([x for x, _ in dataset])
+    y_pred = model.predict_many(X)
+    for x, yp in zip(X.to_dict(orient="records"), y_pred):
+        assert math.isclose(model.predict_one(x), yp, abs_tol=tol)
+
+
+@pytest.mark.skipif(shutil.which("cc") is None, reason="no C compiler")
+@pytest.mark.parametrize("precision", ["fp64", "fp32"])
+def test_hotr_to_c(tmp_path, precision):
+    dataset = list(get_regression_data())
+
+    model = tree.HoeffdingOptionTreeRegressor(grace_period=50, predict_precision=precision)
+    for x, y in dataset:
+        model.learn_one(x, y)
+
+    X = pd.DataFrame([x for x, _ in dataset])
+    X[0] = X[0].mask(X.index % 7 == 0)
+    # The export is exact whatever the precision of predict_many
+    y_pred = [
+        model.predict_one({k: v for k, v in x.items() if not math.isnan(v)})
+        for x in X.to_dict(orient="records")
+    ]
+
+    src, lib = str(tmp_path / "tree.c"), str(tmp_path / "tree.so")
+    model.to_c(src)
+    subprocess.check_call(["cc", "-O2", "-shared", "-fPIC", src, "-o", lib])
+    model.load_c(lib)
+    for yp, yc in zip(y_pred, model.predict_many(X)):
+        assert math.isclose(yp, yc, rel_tol=1e-9)
+
+    # The rows are shared among threads when the code is built with OpenMP
+    lib_omp = str(tmp_path / "tree_omp.so")
+    try:
+        subprocess.check_call(["cc", "-O2", "-fopenmp", "-shared", "-fPIC", src, "-o", lib_omp])
+    except subprocess.CalledProcessError:
+        pytest.skip("no OpenMP support")
+    model.load_c(lib_omp)
+    for yp, yc in zip(y_pred, model.predict_many(X)):
+        assert math.isclose(yp, yc, rel_tol=1e-9)
+
+
+def test_hotr_option_arrays_predict_one():
+    dataset = list(get_regression_data())
+
+    def walk(model, x):
+        total, count = tree.nodes.branch.sum_leaves(model._root, x, model)
+        return total / count
+
+    # The arrays of the option nodes follow the leaf models as they learn
+    model = tree.HoeffdingOptionTreeRegressor(grace_period=50)
+    for i, (x, y) in enumerate(dataset):
+        if i % 3 == 0:
+            x = {k: v for k, v in x.items() if k != 0}
+        assert math.isclose(model.predict_one(x), walk(model, x) if model._root else 0.0)
+        model.learn_one(x, y)
+    assert model._option_arrays
+
+    # The arrays are kept and follow the leaf models through mini-batches as well
+    X = pd.DataFrame([x for x, _ in dataset])
+    Y = pd.Series([y for _, y in dataset])
+    arrays = dict(model._option_arrays)
+    for i in range(0, 100, 10):
+        model.learn_many(X[i : i + 10], Y[i : i + 10])
+        for x, _ in dataset[i + 10 : i + 20]:
+            assert math.isclose(model.predict_one(x), walk(model, x), rel_tol=1e-9)
+    assert any(model._option_arrays.get(k) is v for k, v in arrays.items())
+
+    # The predictions do not depend on the previous calls
+    for x, _ in dataset[:50]:
+        x = {k: v for k, v in x.items() if k != 0}
+        y_pred = model.predict_one(x)
+        assert math.isclose(model.predict_one(x), y_pred)
+        assert math.isclose(y_pred, walk(model, x), rel_tol=1e-9)
+
+    # The arrays are not part of the size of the model
+    model._estimate_model_size()
+    size = model._active_leaf_size_estimate
+    model._option_arrays = {}
+    model._estimate_model_size()
+    assert model._active_leaf_size_estimate == size
+
+
+def test_hotr_split_root_with_options():
+    dataset = list(synth.Friedman(seed=0).take(2000))
+
+    model = tree.HoeffdingOptionTreeRegressor(grace_period=50)
+    for x, y in dataset:
+        model.learn_one(x, y)
+
+    # The root is a split and the option nodes lie below it
+    assert not isinstance(model._root, tree.nodes.branch.OptionNode)
+    assert model._root.n_option_nodes > 0
+    assert isinstance(model.predict_one(dataset[0][0]), float)
+
+    # The fused walk averages the same leaves as the list of reached leaves
+    for x, _ in dataset[:50]:
+        leaves = tree.nodes.branch.reached_leaves(model._root, x)
+        total, count = tree.nodes.branch.sum_leaves(model._root, x, model)
+        assert count == len(leaves)
+        assert math.isclose(
+            total, sum(leaf.prediction(x, tree=model) for leaf in leaves)
+        )
+
+
+def test_hotr_learn_many():
+    dataset = list(get_regression_data())
+    X = pd.DataFrame([x for x, _ in dataset])
+    X[0] = X[0].mask(X.index % 7 == 0)
+    y = pd.Series([y for _, y in dataset])
+
+    # Below the grace period, the single leaf ends up in the same state as with learn_one
+    one = tree.HoeffdingOptionTreeRegressor(grace_period=50)
+    for x, yi in zip(X[:40].to_dict(orient="records"), y[:40]):
+        one.learn_one({k: v for k, v in x.items() if not math.isnan(v)}, yi)
+    many = tree.HoeffdingOptionTreeRegressor(grace_period=50)
+    many.learn_many(X[:20], y[:20])
+    many.learn_many(X[20:40], y[20:40])
+
+    leaf_one, leaf_many = one._root.children[0], many._root.children[0]
+    assert leaf_one.total_weight == leaf_many.total_weight == 40
+    assert math.isclose(leaf_one.stats.mean.get(), leaf_many.stats.mean.get())
+    assert math.isclose(leaf_one.stats.get(), leaf_many.stats.get())
+    for x, _ in dataset[:40]:
+        assert math.isclose(one.predict_one(x), many.predict_one(x))
+
+    # The leaves are split at the end of each mini-batch
+    for i in range(40, len(X), 50):
+        many.learn_many(X[i : i + 50], y[i : i + 50])
+    assert many._train_weight_seen_by_model == len(X)
+    assert many.n_nodes > 2
+
+    # The rows whose split feature is missing follow the current most traversed path, even if
+    # the leaves have learned since the structure was flattened
+    routing = many._flatten()
+    many.grace_period = math.inf
+    for x, yi in zip(X[::3].to_dict(orient="records"), y[::3]):
+        many.learn_one({k: v for k, v in x.items() if not math.isnan(v)}, yi)
+    X_arr = X.reindex(columns=routing.features).to_numpy(dtype=float)
+    leaves = tree.hoeffding_option_tree_regressor._route_compiled(routing, X_arr)
+    for x, pos in zip(X.to_dict(orient="records"), leaves):
+        x = {k: v for k, v in x.items() if not math.isnan(v)}
+        assert routing.nodes[pos] is many._learning_leaf(x)
+
+
+def test_hotr_slotted_branches():
+    model = tree.HoeffdingOptionTreeRegressor(grace_period=50)
+    for x, y in get_regression_data():
+        model.learn_one(x, y)
+
+    branches = list(model._root.iter_branches())
+    assert len(branches) > 1
+    for branch in branches:
+        # The attributes declared as slots are not stored in the instance dictionary
+        assert "feature" not in vars(branch) and "stats" not in vars(branch)
+
+    # Extra attributes are still accepted
+    branch = tree.nodes.branch.NumericBinaryBranch(
+        {}, "x", 0.5, 1, *list(model._root.iter_leaves())[:2], foo=1
+    )
+    assert branch.foo == 1
+    assert branch.threshold == 0.5
+
+    # The attributes stored in slots are accounted for in the size of the model
+    leaf_size = max(
+        utils.skmultiflow_utils.calculate_object_size(leaf)
+        for leaf in model._root.iter_leaves()
+    )
+    assert utils.skmultiflow_utils.calculate_object_size(model._root) > leaf_size
+    assert model._raw_memory_usage > leaf_size
+
+
+def test_hotr_hist_bins():
+    model = tree.HoeffdingOptionTreeRegressor(grace_period=50, hist_bins=32)
+    assert isinstance(model.splitter, tree.splitter.HistogramSplitterReg)
+    for x, y in get_regression_data():
+        model.learn_one(x, y)
+    assert model.n_nodes > 2
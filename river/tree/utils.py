@@ -66,6 +66,26 @@ def do_naive_bayes_prediction(x, observed_class_distribution: dict, splitters: d
     return votes
 
 
+def iter_records(X) -> typing.Iterator[dict]:
+    """Iterate over the rows of a dataframe as dictionaries, leaving out the missing values.
+
+    Parameters
+    ----------
+    X
+        A dataframe of features.
+    """
+    # Converting the values to Python objects all at once is much cheaper than row by row. A
+    # single numeric dtype is converted as a block, otherwise each column keeps its own type
+    columns = list(X.columns)
+    dtypes = set(X.dtypes)
+    if len(dtypes) == 1 and dtypes.pop().kind in "biuf":
+        rows = X.to_numpy().tolist()
+    else:
+        rows = zip(*(column.tolist() for _, column in X.items()))
+    for row in rows:
+        yield {k: v for k, v in zip(columns, row) if v == v}  # NaN is unequal to itself
+
+
 @functools.total_ordering
 @dataclasses.dataclass
 class BranchFactory:
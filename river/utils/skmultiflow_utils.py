@@ -1,4 +1,5 @@
 import copy
+import functools
 import math
 import numbers
 import sys
@@ -75,6 +76,50 @@ def scale_values_in_dict(dictionary, multiplier, inplace=True):
     return dictionary
 
 
+@functools.lru_cache(maxsize=None)
+def slot_names(cls) -> typing.Tuple[str, ...]:
+    """Return the names of the slots declared by a class and its ancestors.
+
+    The slots of the ancestors come first.
+
+    Parameters
+    ----------
+    cls
+        The class to inspect.
+
+    """
+    names = []
+    for klass in reversed(cls.__mro__):
+        slots = klass.__dict__.get("__slots__", ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        for name in slots:
+            if name in ("__dict__", "__weakref__"):
+                continue
+            if name.startswith("__") and not name.endswith("__"):  # private names are mangled
+                name = f"_{klass.__name__.lstrip('_')}{name}"
+            names.append(name)
+    return tuple(names)
+
+
+def object_attributes(obj: typing.Any) -> dict:
+    """Return the attributes of an object, whether they are stored in its `__dict__` or in slots.
+
+    Parameters
+    ----------
+    obj
+        The object to inspect.
+
+    """
+    attributes = dict(getattr(obj, "__dict__", {}))
+    for name in slot_names(type(obj)):
+        try:
+            attributes[name] = getattr(obj, name)
+        except AttributeError:  # the slot has not been set
+            pass
+    return attributes
+
+
 def calculate_object_size(obj: typing.Any, unit: str = "byte") -> int:
     """Iteratively calculates the `obj` size in bytes.
 
@@ -123,8 +168,19 @@ def calculate_object_size(obj: typing.Any, unit: str = "byte") -> int:
 
             for k in obj.keys():
                 to_visit.append(k)
-        elif hasattr(obj, "__dict__"):
-            to_visit.append(obj.__dict__)
+        elif isinstance(obj, np.ndarray):
+            # The buffer owned by an array is already part of its size, a view shares the one of
+            # its base. Only the elements of object arrays are visited one by one
+            if obj.base is not None:
+                to_visit.append(obj.base)
+            if obj.dtype == object:
+                to_visit.extend(obj.ravel())
+        elif hasattr(obj, "__dict__") or slot_names(type(obj)):
+            if hasattr(obj, "__dict__"):
+                to_visit.append(obj.__dict__)
+            # The attributes stored in slots are not part of the __dict__
+            for name in slot_names(type(obj)):
+                to_visit.append(getattr(obj, name, None))
         elif hasattr(obj, "__iter__") and not isinstance(obj, (str, bytes, bytearray)):
             for i in obj:
                 to_visit.append(i)